@@ -1,14 +1,93 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import time
+import math
 from PIL import Image, ImageTk
 import struct
+import array
 import numpy as np
 
+try:
+    from numba import njit
+except ImportError:  # Optional, the Python interpreter is used instead
+    njit = None
+
+# Pre-decoded operation ids, used as indices into Kernel._handlers
+OP_ADD = 0
+OP_SUB = 1
+OP_ADDI = 2
+OP_LUI = 3
+OP_DRAW_RECT = 4
+OP_RENDER = 5
+OP_HALT = 6
+OP_INVALID = 7
+OP_NOP = 8
+OP_LOAD_CONST32 = 9
+OP_SET_REGS = 10
+OP_DRAW_PRESENT = 11
+
+# Padding left in the slots a superinstruction absorbed, so pc >> 2 still
+# indexes the icache
+NOP = (OP_NOP, 0, 0, 0, 0)
+
+# Ops that end a basic block: they render, stop or fail
+BLOCK_END_OPS = frozenset((OP_RENDER, OP_HALT, OP_INVALID, OP_DRAW_PRESENT))
+
+# Built-in demo program, stored already decoded for Kernel.load_decoded
+DEMO_DECODED = (
+    # Load upper immediate and add immediate to set up larger addresses
+    (OP_LUI, 0, 1, 0, 0x0001),      # lui r1, 0x0001
+    (OP_ADDI, 1, 1, 0, 0x0000),     # addi r1, r1, 0x0000
+
+    # Set up rectangle parameters
+    (OP_ADDI, 0, 2, 0, 100),        # addi r2, r0, 100
+    (OP_ADDI, 0, 3, 0, 200),        # addi r3, r0, 200
+    (OP_ADDI, 0, 4, 0, 150),        # addi r4, r0, 150
+    (OP_ADDI, 0, 5, 0, 0x1F),       # addi r5, r0, 0x1F
+
+    (OP_DRAW_RECT, 0, 0, 0, 0),     # draw rectangle
+    (OP_RENDER, 0, 0, 0, 0),        # render
+    (OP_HALT, 0, 0, 0, 0),          # halt
+)
+
+def _run_core(icache_ops, icache_args, regs, pc, max_steps):
+    """Run up to max_steps ALU ops until one needs Python, return (pc, ops executed)"""
+    n = icache_ops.shape[0]
+    steps = 0
+    while (pc >> 2) < n and steps < max_steps:
+        i = pc >> 2
+        op = icache_ops[i]
+        a = icache_args[i, 0]
+        b = icache_args[i, 1]
+        c = icache_args[i, 2]
+        imm = icache_args[i, 3]
+
+        if op == OP_ADD:
+            regs[c] = (np.int64(regs[a]) + np.int64(regs[b])) & 0xFFFFFFFF
+        elif op == OP_SUB:
+            regs[c] = (np.int64(regs[a]) - np.int64(regs[b])) & 0xFFFFFFFF
+        elif op == OP_ADDI:
+            regs[b] = (np.int64(regs[a]) + imm) & 0xFFFFFFFF
+        elif op == OP_LUI:
+            regs[b] = imm << 16
+        elif op == OP_LOAD_CONST32:
+            regs[a] = imm
+            pc += 4  # Skip the padding NOP
+        elif op != OP_NOP:
+            # Graphics, halt and anything else go back to Python
+            return pc, steps
+
+        pc += 4
+        steps += 1
+    return pc, steps
+
+if njit is not None:
+    _run_core = njit(cache=True)(_run_core)
+
 class Memory:
     # N64 Memory Map Constants
     RDRAM_SIZE = 8 * 1024 * 1024  # 8MB
-    RDRAM_START = 0x00000000
+    RDRAM_START = 0x00000000  # Accessors check 0 <= address < RDRAM_SIZE
     RDRAM_END = RDRAM_START + RDRAM_SIZE - 1
     
     PIF_ROM_START = 0x1FC00000
@@ -19,61 +98,76 @@ class Memory:
         # Initialize main RAM using numpy for better performance
         self.rdram = np.zeros(self.RDRAM_SIZE, dtype=np.uint8)
         self.pif_rom = np.zeros(self.PIF_ROM_SIZE, dtype=np.uint8)
+        # Big-endian word views sharing the byte arrays above
+        self.rdram_be32 = self.rdram.view('>u4')
+        self.pif_rom_be32 = self.pif_rom.view('>u4')
         
-        # Memory stats
+        # Memory stats, only counted while stats_enabled is set
+        self.stats_enabled = False
         self.reads = 0
         self.writes = 0
         
-    def map_address(self, address):
-        """Map virtual address to physical memory region"""
-        if self.RDRAM_START <= address <= self.RDRAM_END:
-            return ("RDRAM", address - self.RDRAM_START)
-        elif self.PIF_ROM_START <= address <= self.PIF_ROM_END:
-            return ("PIF_ROM", address - self.PIF_ROM_START)
-        else:
-            raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
-
     def read_byte(self, address):
         """Read a single byte from memory"""
-        region, offset = self.map_address(address)
-        self.reads += 1
-        
-        if region == "RDRAM":
-            return self.rdram[offset]
-        elif region == "PIF_ROM":
-            return self.pif_rom[offset]
+        if self.stats_enabled:
+            self.reads += 1
+
+        if 0 <= address < self.RDRAM_SIZE:
+            return self.rdram[address]
+        elif self.PIF_ROM_START <= address <= self.PIF_ROM_END:
+            return self.pif_rom[address - self.PIF_ROM_START]
+        raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
 
     def write_byte(self, address, value):
         """Write a single byte to memory"""
-        region, offset = self.map_address(address)
-        self.writes += 1
-        
-        if region == "RDRAM":
-            self.rdram[offset] = value & 0xFF
-        elif region == "PIF_ROM":
+        if self.stats_enabled:
+            self.writes += 1
+
+        if 0 <= address < self.RDRAM_SIZE:
+            self.rdram[address] = value & 0xFF
+        elif self.PIF_ROM_START <= address <= self.PIF_ROM_END:
             # PIF ROM is read-only
             raise MemoryError("Cannot write to PIF ROM")
+        else:
+            raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
 
     def read_word(self, address):
         """Read a 32-bit word from memory"""
-        region, offset = self.map_address(address)
-        self.reads += 4
-        
-        if region == "RDRAM":
-            return struct.unpack('>I', self.rdram[offset:offset+4])[0]
-        elif region == "PIF_ROM":
-            return struct.unpack('>I', self.pif_rom[offset:offset+4])[0]
+        if self.stats_enabled:
+            self.reads += 4
+
+        if 0 <= address < self.RDRAM_SIZE:
+            if address & 3:
+                if address + 3 >= self.RDRAM_SIZE:
+                    raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
+                return int.from_bytes(self.rdram[address:address+4].tobytes(), 'big')
+            return int(self.rdram_be32[address >> 2])
+        elif self.PIF_ROM_START <= address <= self.PIF_ROM_END:
+            offset = address - self.PIF_ROM_START
+            if offset & 3:
+                if address + 3 > self.PIF_ROM_END:
+                    raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
+                return int.from_bytes(self.pif_rom[offset:offset+4].tobytes(), 'big')
+            return int(self.pif_rom_be32[offset >> 2])
+        raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
 
     def write_word(self, address, value):
         """Write a 32-bit word to memory"""
-        region, offset = self.map_address(address)
-        self.writes += 4
-        
-        if region == "RDRAM":
-            self.rdram[offset:offset+4] = struct.pack('>I', value)
-        elif region == "PIF_ROM":
+        if self.stats_enabled:
+            self.writes += 4
+
+        if 0 <= address < self.RDRAM_SIZE:
+            if address & 3:
+                if address + 3 >= self.RDRAM_SIZE:
+                    raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
+                self.rdram[address:address+4] = list((value & 0xFFFFFFFF).to_bytes(4, 'big'))
+            else:
+                self.rdram_be32[address >> 2] = value & 0xFFFFFFFF
+        elif self.PIF_ROM_START <= address <= self.PIF_ROM_END:
             raise MemoryError("Cannot write to PIF ROM")
-            
+        else:
+            raise MemoryError(f"Invalid memory access at address: 0x{address:08X}")
+
     def get_stats(self):
         """Return memory usage statistics"""
         return {
@@ -89,15 +183,40 @@ class Graphics:
         self.height = 480
         # Use numpy for framebuffer for better performance
         self.framebuffer = np.zeros((self.height, self.width), dtype=np.uint16)
-        self.image = Image.new("RGB", (self.width, self.height))
-        self.pixels = self.image.load()
+
+        # Every RGB555 pixel value expanded to a packed little-endian RGBA word
+        index = np.arange(65536, dtype=np.uint32)
+        r = ((index >> 10) & 0x1F) * 8
+        g = ((index >> 5) & 0x1F) * 8
+        b = (index & 0x1F) * 8
+        self.palette = (r | (g << 8) | (b << 16) | (0xFF << 24)).astype('<u4')
+
+        # Persistent RGBA buffer, shared by the PIL image that is pasted to Tk
+        self.rgba = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        self.rgba32 = self.rgba.view('<u4').reshape(self.height, self.width)
+        self.image = Image.frombuffer('RGBA', (self.width, self.height), self.rgba,
+                                      'raw', 'RGBA', 0, 1)
+        self.photo = ImageTk.PhotoImage(self.image)
+        self.canvas_image = self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
+
+        # Framebuffer area changed since the last render as (x1, y1, x2, y2),
+        # only this part is converted to RGBA
+        self.dirty = (0, 0, self.width, self.height)
+
+    def mark_dirty(self, x1, y1, x2, y2):
+        if self.dirty is not None:
+            dx1, dy1, dx2, dy2 = self.dirty
+            x1, y1, x2, y2 = min(x1, dx1), min(y1, dy1), max(x2, dx2), max(y2, dy2)
+        self.dirty = (x1, y1, x2, y2)
 
     def clear_screen(self, color=0):
-        self.framebuffer.fill(color)
+        self.framebuffer.fill(color & 0xFFFF)
+        self.dirty = (0, 0, self.width, self.height)
 
     def draw_pixel(self, x, y, color):
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.framebuffer[y, x] = color
+            self.framebuffer[y, x] = color & 0xFFFF
+            self.mark_dirty(x, y, x + 1, y + 1)
 
     def draw_rectangle(self, x, y, width, height, color):
         x1 = max(0, x)
@@ -106,113 +225,335 @@ class Graphics:
         y2 = min(self.height, y + height)
         
         if x1 < x2 and y1 < y2:
+            self.framebuffer[y1:y2, x1:x2] = color & 0xFFFF
+            self.mark_dirty(x1, y1, x2, y2)
+
+    def draw_and_present(self, x, y, width, height, color):
+        """Draw a rectangle and render, writing its RGBA pixels directly"""
+        x1 = max(0, x)
+        y1 = max(0, y)
+        x2 = min(self.width, x + width)
+        y2 = min(self.height, y + height)
+
+        if x1 < x2 and y1 < y2:
+            color &= 0xFFFF
             self.framebuffer[y1:y2, x1:x2] = color
+            self.rgba32[y1:y2, x1:x2] = self.palette[color]
+
+        self._convert_dirty()
+        self.photo.paste(self.image)
 
     def render(self):
-        # Convert framebuffer to RGB using numpy operations
-        r = ((self.framebuffer >> 10) & 0x1F) * 8
-        g = ((self.framebuffer >> 5) & 0x1F) * 8
-        b = (self.framebuffer & 0x1F) * 8
-        
-        # Stack RGB components
-        rgb_array = np.stack((r, g, b), axis=-1).astype(np.uint8)
-        
-        # Convert to PIL Image
-        self.image = Image.fromarray(rgb_array, mode='RGB')
-        self.photo = ImageTk.PhotoImage(self.image)
-        self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
+        if self.dirty is None:
+            return  # Tk already shows the current frame
+
+        self._convert_dirty()
+        self.photo.paste(self.image)
+
+    def _convert_dirty(self):
+        if self.dirty is None:
+            return
+
+        # One palette gather converts the changed area to RGBA in place
+        x1, y1, x2, y2 = self.dirty
+        self.dirty = None
+        np.take(self.palette, self.framebuffer[y1:y2, x1:x2], out=self.rgba32[y1:y2, x1:x2])
 
 class Kernel:
-    def __init__(self, memory, graphics):
+    # Instructions run per Tk callback, and the frame pacing for render
+    CHUNK_SIZE = 10000
+    FRAME_TIME = 1 / 60
+
+    def __init__(self, memory, graphics, root):
         self.memory = memory
         self.graphics = graphics
+        self.root = root
         self.pc = 0
-        self.registers = np.zeros(32, dtype=np.uint32)
+        # Scalar register access is cheaper on array.array than on numpy;
+        # the numpy view shares its storage for the native core
+        self.registers = array.array('I', [0] * 32)
+        self.registers_view = np.frombuffer(self.registers, dtype=np.uint32)
         self.running = True
         self.cycles = 0
+        # Cooperative scheduling on the Tk event loop
+        self.next_frame_deadline = 0.0
+        self.frame_done = False
+        self._after_id = None
+        # Run ALU ops in the compiled core when numba is available
+        self.native = njit is not None
+
+        # Pre-decoded program, one (op, a, b, c, imm) tuple per word
+        self.icache = []
+        # Indexed by the OP_* ids stored in the icache
+        self._handlers = [
+            self._op_add,
+            self._op_sub,
+            self._op_addi,
+            self._op_lui,
+            self._op_draw_rect,
+            self._op_render,
+            self._op_halt,
+            self._op_invalid,
+            self._op_nop,
+            self._op_load_const32,
+            self._op_set_regs,
+            self._op_draw_present,
+        ]
+
+        # Per-opcode decoders, indexed by the top 6 bits of the instruction
+        self.OPCODES = [self._decode_invalid] * 64
+        self.OPCODES[0x00] = self._decode_rtype
+        self.OPCODES[0x08] = self._decode_addi
+        self.OPCODES[0x0F] = self._decode_lui
+        self.OPCODES[0x2D] = self._decode_draw_rect
+        self.OPCODES[0x2E] = self._decode_render
+        self.OPCODES[0x3F] = self._decode_halt
+
+        # R-type decoders, indexed by funct
+        self.RTYPE = [self._decode_invalid] * 64
+        self.RTYPE[0x20] = self._decode_add
+        self.RTYPE[0x22] = self._decode_sub
 
     def load_program(self, program):
+        program = bytes(program)
         for i, byte in enumerate(program):
             self.memory.write_byte(i, byte)
+
+        # Decode every word once so run() never goes back to memory
+        program += bytes(-len(program) % 4)
+        self.load_decoded(self.decode_instruction(word)
+                          for (word,) in struct.iter_unpack('>I', program))
+
+    def load_decoded(self, ops):
+        """Load a program given as decoded (op, a, b, c, imm) tuples"""
+        self.icache = list(ops)
+        self._fuse_superinstructions()
+        if self.native:
+            self._build_native_icache()
         self.pc = 0
+        self.running = True
 
-    def fetch_instruction(self):
-        instruction = self.memory.read_word(self.pc)
-        self.pc += 4
-        self.cycles += 1
-        return instruction
+    def _fuse_superinstructions(self):
+        icache = self.icache
+        n = len(icache)
+        i = 0
+        while i < n - 1:
+            op, _rs, rt, _rd, imm = icache[i]
+            following = icache[i + 1]
+
+            # lui rt, hi; addi rt, rt, lo -> load_const32 rt, (hi << 16) + lo
+            if (op == OP_LUI and following[0] == OP_ADDI
+                    and following[1] == rt and following[2] == rt):
+                value = ((imm << 16) + following[4]) & 0xFFFFFFFF
+                icache[i] = (OP_LOAD_CONST32, rt, 0, 0, value)
+                icache[i + 1] = NOP
+                i += 2
+                continue
+
+            # Run of addi rt, r0, imm -> set_regs ((rt, imm), ...)
+            end = i
+            while end < n and icache[end][0] == OP_ADDI and icache[end][1] == 0:
+                end += 1
+            if end - i > 1:
+                pairs = tuple((entry[2], entry[4] & 0xFFFFFFFF)
+                              for entry in icache[i:end])
+                icache[i] = (OP_SET_REGS, end - i - 1, 0, 0, pairs)
+                icache[i + 1:end] = [NOP] * (end - i - 1)
+                i = end
+                continue
+
+            # draw rectangle; render -> draw_present
+            if op == OP_DRAW_RECT and following[0] == OP_RENDER:
+                icache[i] = (OP_DRAW_PRESENT, 0, 0, 0, 0)
+                icache[i + 1] = NOP
+                i += 2
+                continue
+
+            i += 1
 
     def decode_instruction(self, instruction):
-        opcode = instruction >> 26
-
-        if opcode == 0:  # R-type
-            rs = (instruction >> 21) & 0x1F
-            rt = (instruction >> 16) & 0x1F
-            rd = (instruction >> 11) & 0x1F
-            funct = instruction & 0x3F
-            
-            if funct == 0x20:  # ADD
-                def func():
-                    self.registers[rd] = (self.registers[rs] + self.registers[rt]) & 0xFFFFFFFF
-                return func
-            elif funct == 0x22:  # SUB
-                def func():
-                    self.registers[rd] = (self.registers[rs] - self.registers[rt]) & 0xFFFFFFFF
-                return func
-
-        elif opcode == 0x08:  # ADDI
-            rs = (instruction >> 21) & 0x1F
-            rt = (instruction >> 16) & 0x1F
-            imm = instruction & 0xFFFF
-            if imm & 0x8000:  # Sign-extend
-                imm -= 0x10000
-            def func():
-                self.registers[rt] = (self.registers[rs] + imm) & 0xFFFFFFFF
-            return func
-
-        elif opcode == 0x0F:  # LUI
-            rt = (instruction >> 16) & 0x1F
-            imm = instruction & 0xFFFF
-            def func():
-                self.registers[rt] = imm << 16
-            return func
-
-        elif opcode == 0x2D:  # Draw rectangle
-            def func():
-                x = self.registers[1]
-                y = self.registers[2]
-                w = self.registers[3]
-                h = self.registers[4]
-                color = self.registers[5]
-                self.graphics.draw_rectangle(x, y, w, h, color)
-            return func
-
-        elif opcode == 0x2E:  # Render framebuffer
-            def func():
-                self.graphics.render()
-                time.sleep(0.016)  # ~60 FPS
-            return func
-
-        elif opcode == 0x3F:  # Halt
-            def func():
-                self.running = False
-            return func
-
-        else:
-            def func():
-                raise ValueError(f"Unknown opcode: {opcode}")
-            return func
+        # r0 is hardwired to zero, so ops that would only write it decode to NOP
+        return self.OPCODES[instruction >> 26](instruction)
+
+    def _decode_rtype(self, instruction):
+        return self.RTYPE[instruction & 0x3F](instruction)
+
+    def _decode_add(self, instruction):
+        rs = (instruction >> 21) & 0x1F
+        rt = (instruction >> 16) & 0x1F
+        rd = (instruction >> 11) & 0x1F
+        if rd == 0:
+            return NOP
+        return (OP_ADD, rs, rt, rd, 0)
+
+    def _decode_sub(self, instruction):
+        rs = (instruction >> 21) & 0x1F
+        rt = (instruction >> 16) & 0x1F
+        rd = (instruction >> 11) & 0x1F
+        if rd == 0:
+            return NOP
+        return (OP_SUB, rs, rt, rd, 0)
+
+    def _decode_addi(self, instruction):
+        rs = (instruction >> 21) & 0x1F
+        rt = (instruction >> 16) & 0x1F
+        if rt == 0:
+            return NOP
+        imm = instruction & 0xFFFF
+        if imm & 0x8000:  # Sign-extend
+            imm -= 0x10000
+        return (OP_ADDI, rs, rt, 0, imm)
+
+    def _decode_lui(self, instruction):
+        rt = (instruction >> 16) & 0x1F
+        if rt == 0:
+            return NOP
+        return (OP_LUI, 0, rt, 0, instruction & 0xFFFF)
+
+    def _decode_draw_rect(self, instruction):
+        return (OP_DRAW_RECT, 0, 0, 0, 0)
+
+    def _decode_render(self, instruction):
+        return (OP_RENDER, 0, 0, 0, 0)
+
+    def _decode_halt(self, instruction):
+        return (OP_HALT, 0, 0, 0, 0)
+
+    def _decode_invalid(self, instruction):
+        return (OP_INVALID, instruction >> 26, instruction & 0x3F, 0, 0)
+
+    def _op_add(self, rs, rt, rd, _imm):
+        self.registers[rd] = (self.registers[rs] + self.registers[rt]) & 0xFFFFFFFF
+
+    def _op_sub(self, rs, rt, rd, _imm):
+        self.registers[rd] = (self.registers[rs] - self.registers[rt]) & 0xFFFFFFFF
+
+    def _op_addi(self, rs, rt, _rd, imm):
+        self.registers[rt] = (self.registers[rs] + imm) & 0xFFFFFFFF
+
+    def _op_lui(self, _rs, rt, _rd, imm):
+        self.registers[rt] = imm << 16
+
+    def _op_draw_rect(self, _a, _b, _c, _imm):
+        x = self.registers[1]
+        y = self.registers[2]
+        w = self.registers[3]
+        h = self.registers[4]
+        color = self.registers[5]
+        self.graphics.draw_rectangle(x, y, w, h, color)
+
+    def _op_render(self, _a, _b, _c, _imm):
+        self.graphics.render()
+        self._end_frame()
+
+    def _end_frame(self):
+        # Hand control back to Tk until the next frame is due (~60 FPS)
+        self.next_frame_deadline = time.perf_counter() + self.FRAME_TIME
+        self.frame_done = True
+
+    def _op_halt(self, _a, _b, _c, _imm):
+        self.running = False
+
+    def _op_invalid(self, opcode, funct, _c, _imm):
+        if opcode == 0:
+            raise ValueError(f"Unknown R-type funct: 0x{funct:02X}")
+        raise ValueError(f"Unknown opcode: {opcode}")
+
+    def _op_nop(self, _a, _b, _c, _imm):
+        pass
+
+    def _op_load_const32(self, rt, _b, _c, value):
+        self.registers[rt] = value
+        self.pc += 4  # Skip the padding NOP
+
+    def _op_set_regs(self, padding, _b, _c, pairs):
+        registers = self.registers
+        for rt, value in pairs:
+            registers[rt] = value
+        self.pc += padding << 2
+
+    def _op_draw_present(self, _a, _b, _c, _imm):
+        r = self.registers
+        self.graphics.draw_and_present(r[1], r[2], r[3], r[4], r[5])
+        self.pc += 4  # Skip the padding NOP
+        self._end_frame()
+
+    def _build_native_icache(self):
+        # Typed copy of the icache for _run_core; set_regs stays in Python
+        self.icache_ops = np.array([entry[0] for entry in self.icache], dtype=np.int32)
+        self.icache_args = np.array(
+            [(a, b, c, 0 if op == OP_SET_REGS else imm)
+             for op, a, b, c, imm in self.icache],
+            dtype=np.int64).reshape(-1, 4)
+
+    def _interpret_block(self, budget):
+        # Execute up to and including the next op that ends a block, or
+        # until the cycle count reaches budget
+        icache = self.icache
+        handlers = self._handlers
+        try:
+            while self.cycles < budget:
+                op, a, b, c, imm = icache[self.pc >> 2]
+                self.pc += 4
+                self.cycles += 1
+                handlers[op](a, b, c, imm)
+                if op in BLOCK_END_OPS:
+                    return
+
+        except IndexError:
+            if (self.pc >> 2) < len(icache):
+                raise
+            raise MemoryError(f"Instruction fetch outside the program at address: 0x{self.pc:08X}") from None
+
+    def _run_native(self, budget):
+        max_steps = budget - self.cycles
+        pc, steps = _run_core(self.icache_ops, self.icache_args, self.registers_view,
+                              self.pc, max_steps)
+        self.cycles += steps
+        if steps >= max_steps:
+            # Out of budget; resume at pc in the next chunk
+            self.pc = pc
+            return
+
+        if (pc >> 2) >= len(self.icache):
+            raise MemoryError(f"Instruction fetch outside the program at address: 0x{pc:08X}")
+
+        # Execute the op the core stopped at with its Python handler
+        op, a, b, c, imm = self.icache[pc >> 2]
+        self.pc = pc + 4
+        self.cycles += 1
+        self._handlers[op](a, b, c, imm)
 
     def run(self):
+        # (Re)start the run loop as a chain of Tk callbacks
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(0, self.run_chunk)
+
+    def run_chunk(self):
+        self._after_id = None
+        if not self.running:
+            return
+
+        delay = self.next_frame_deadline - time.perf_counter()
+        if delay > 0:
+            self._after_id = self.root.after(math.ceil(delay * 1000), self.run_chunk)
+            return
+
+        step = self._run_native if self.native else self._interpret_block
+        budget = self.cycles + self.CHUNK_SIZE
+        self.frame_done = False
         try:
-            while self.running:
-                instruction = self.fetch_instruction()
-                self.decode_instruction(instruction)()
-                
+            while self.running and not self.frame_done and self.cycles < budget:
+                step(budget)
+
         except Exception as e:
             messagebox.showerror("Emulation Error", str(e))
             self.running = False
 
+        if self.running:
+            self._after_id = self.root.after(0, self.run_chunk)
+
 class GameWindow(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -224,29 +565,12 @@ class GameWindow(tk.Tk):
 
         self.memory = Memory()
         self.graphics = Graphics(self.canvas)
-        self.kernel = Kernel(self.memory, self.graphics)
+        self.kernel = Kernel(self.memory, self.graphics, self)
 
         # Create menu
         self.create_menu()
         
-        # Demo program that uses more memory
-        self.demo_program = [
-            # Load upper immediate and add immediate to set up larger addresses
-            (0x0F << 26) | (1 << 16) | 0x0001,      # lui r1, 0x0001
-            (0x08 << 26) | (1 << 21) | (1 << 16) | 0x0000,  # addi r1, r1, 0x0000
-            
-            # Set up rectangle parameters
-            (0x08 << 26) | (2 << 21) | (2 << 16) | 100,     # addi r2, r0, 100
-            (0x08 << 26) | (3 << 21) | (3 << 16) | 200,     # addi r3, r0, 200
-            (0x08 << 26) | (4 << 21) | (4 << 16) | 150,     # addi r4, r0, 150
-            (0x08 << 26) | (5 << 21) | (5 << 16) | 0x1F,    # addi r5, r0, 0x1F
-            
-            (0x2D << 26),                           # draw rectangle
-            (0x2E << 26),                           # render
-            (0x3F << 26),                           # halt
-        ]
-
-        self.kernel.load_program(self.demo_program)
+        self.kernel.load_decoded(DEMO_DECODED)
         self.after(100, self.start_emulation)
 
     def create_menu(self):
@@ -262,6 +586,10 @@ class GameWindow(tk.Tk):
         debug_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Debug", menu=debug_menu)
         debug_menu.add_command(label="Memory Stats", command=self.show_memory_stats)
+        self.stats_var = tk.BooleanVar(value=self.memory.stats_enabled)
+        debug_menu.add_checkbutton(label="Count Memory Accesses",
+                                   variable=self.stats_var,
+                                   command=self.toggle_memory_stats)
 
     def load_rom(self):
         filename = filedialog.askopenfilename(
@@ -279,9 +607,13 @@ class GameWindow(tk.Tk):
     def start_emulation(self):
         self.kernel.run()
 
+    def toggle_memory_stats(self):
+        self.memory.stats_enabled = self.stats_var.get()
+
     def show_memory_stats(self):
         stats = self.memory.get_stats()
         messagebox.showinfo("Memory Statistics",
+                          f"Access Counting: {'On' if self.memory.stats_enabled else 'Off'}\n"
                           f"Memory Reads: {stats['reads']}\n"
                           f"Memory Writes: {stats['writes']}\n"
                           f"RDRAM Usage: {stats['rdram_usage']:.2f}%")
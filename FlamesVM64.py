@@ -3,14 +3,29 @@ from tkinter import ttk, filedialog, messagebox
 import os
 import random
 import time
+import math
 from PIL import Image, ImageTk
 import json
 import struct
+import numpy as np
+
+# Pre-decoded operation ids, used as indices into Kernel._handlers
+OP_ADD = 0
+OP_ADDI = 1
+OP_JUMP = 2
+OP_DRAW_PIXEL = 3
+OP_RENDER = 4
+OP_HALT = 5
+OP_INVALID = 6
 
 class Memory:
     def __init__(self, size):
         self.size = size
         self.memory = bytearray(size)
+        # Big-endian word view sharing the bytearray, for aligned word access
+        self.words = np.frombuffer(self.memory, dtype='>u4', count=size // 4)
+        # Byte view of the same bytearray, for scattered writes
+        self.bytes = np.frombuffer(self.memory, dtype=np.uint8)
 
     def read_byte(self, address):
         if 0 <= address < self.size:
@@ -24,15 +39,26 @@ class Memory:
         else:
             raise MemoryError(f"Invalid memory write at address: 0x{address:08x}")
 
+    def write_bytes(self, addresses, values):
+        # Scatter values[i] to addresses[i]; later entries win on duplicates
+        if addresses.size and addresses.max() >= self.size:
+            raise MemoryError(f"Invalid memory write at address: 0x{int(addresses.max()):08x}")
+        self.bytes[addresses] = values
+
     def read_word(self, address):
-        if 0 <= address + 3 < self.size:
-            return struct.unpack('>I', self.memory[address:address+4])[0]
+        if 0 <= address and address + 3 < self.size:
+            if address & 3:
+                return int.from_bytes(self.memory[address:address+4], 'big')
+            return int(self.words[address >> 2])
         else:
             raise MemoryError(f"Invalid memory read at address: 0x{address:08x}")
 
     def write_word(self, address, value):
-        if 0 <= address + 3 < self.size:
-            self.memory[address:address+4] = struct.pack('>I', value)
+        if 0 <= address and address + 3 < self.size:
+            if address & 3:
+                self.memory[address:address+4] = (value & 0xFFFFFFFF).to_bytes(4, 'big')
+            else:
+                self.words[address >> 2] = value & 0xFFFFFFFF
         else:
             raise MemoryError(f"Invalid memory write at address: 0x{address:08x}")
 
@@ -41,95 +67,182 @@ class Graphics:
         self.canvas = canvas
         self.width = 640
         self.height = 480
-        self.framebuffer = [0] * (self.width * self.height)
+        self.framebuffer = np.zeros(self.width * self.height, dtype=np.uint16)
+
+        # Every 8-bit color index expanded to a packed little-endian RGBA word,
+        # repeated so any 16-bit framebuffer value indexes by its low 8 bits
+        index = np.arange(256, dtype=np.uint32)
+        r = ((index >> 5) & 0x07) * 32
+        g = ((index >> 2) & 0x07) * 32
+        b = (index & 0x03) * 64
+        palette = (r | (g << 8) | (b << 16) | (0xFF << 24)).astype('<u4')
+        self.palette = np.tile(palette, 256)
+
+        # Canvas item showing the frame, created by the first render
+        self.canvas_image = None
 
     def clear_screen(self, color=0):
-        self.framebuffer = [color] * (self.width * self.height)
+        self.framebuffer.fill(color & 0xFFFF)
 
     def draw_pixel(self, x, y, color):
         if 0 <= x < self.width and 0 <= y < self.height:
-            index = y * self.width + x
-            self.framebuffer[index] = color
+            self.framebuffer[y * self.width + x] = color & 0xFFFF
 
     def render(self):
-        # This is a very simplified rendering process
-        img = Image.new("RGB", (self.width, self.height))
-        pixels = img.load()
-
-        for y in range(self.height):
-            for x in range(self.width):
-                index = y * self.width + x
-                color = self.framebuffer[index]
-                # Convert simple color index to RGB (very basic mapping)
-                r = (color >> 5) & 0x07
-                g = (color >> 2) & 0x07
-                b = color & 0x03
-                pixels[x, y] = (r * 32, g * 32, b * 64)  # Simple color conversion
+        # This is a very simplified rendering process: only the low 8 bits
+        # of a color are used, looked up in the palette in one gather
+        rgba = self.palette[self.framebuffer].reshape(self.height, self.width)
+        img = Image.frombuffer('RGBA', (self.width, self.height), rgba,
+                               'raw', 'RGBA', 0, 1)
 
         self.photo = ImageTk.PhotoImage(img)
-        self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
+        if self.canvas_image is None:
+            self.canvas_image = self.canvas.create_image(0, 0, image=self.photo, anchor=tk.NW)
+        else:
+            self.canvas.itemconfig(self.canvas_image, image=self.photo)
 
 class Kernel:
-    def __init__(self, memory, graphics):
+    # Instructions run per Tk callback, and the frame pacing for render
+    CHUNK_SIZE = 10000
+    FRAME_TIME = 0.05
+
+    def __init__(self, memory, graphics, root):
         self.memory = memory
         self.graphics = graphics
+        self.root = root
         self.pc = 0  # Program Counter
         self.registers = [0] * 32
         self.running = True
 
+        # Cooperative scheduling on the Tk event loop
+        self.next_frame_deadline = 0.0
+        self.frame_done = False
+        self._after_id = None
+
+        # Pre-decoded program, one (op, a, b, c, imm) tuple per word
+        self.icache = []
+        # Indexed by the OP_* ids stored in the icache
+        self._handlers = [
+            self._op_add,
+            self._op_addi,
+            self._op_jump,
+            self._op_draw_pixel,
+            self._op_render,
+            self._op_halt,
+            self._op_invalid,
+        ]
+
     def load_program(self, program):
         # Very basic program loading (just copy into memory)
+        program = bytes(program)
         for i, byte in enumerate(program):
             self.memory.write_byte(i, byte)
-        self.pc = 0
 
-    def fetch_instruction(self):
-        instruction = self.memory.read_word(self.pc)
-        self.pc += 4
-        return instruction
+        # Decode every word once so run() never goes back to memory
+        program += bytes(-len(program) % 4)
+        self.icache = [self.decode_instruction(word)
+                       for (word,) in struct.iter_unpack('>I', program)]
+        self.pc = 0
 
-    def execute_instruction(self, instruction):
-        # Extremely simplified instruction decoding and execution
+    def decode_instruction(self, instruction):
+        # Extremely simplified instruction decoding
         opcode = instruction >> 26  # Extract opcode (top 6 bits)
 
         if opcode == 0:  # Example: R-type instruction (simplified)
             rs = (instruction >> 21) & 0x1F
             rt = (instruction >> 16) & 0x1F
             rd = (instruction >> 11) & 0x1F
-            # funct = instruction & 0x3F
-
-            # Example: Add two registers
-            self.registers[rd] = self.registers[rs] + self.registers[rt]
+            return (OP_ADD, rs, rt, rd, 0)
 
         elif opcode == 1:
             rs = (instruction >> 21) & 0x1F
-            imm = instruction & 0xFFFF
-            self.registers[rs]+=imm
+            return (OP_ADDI, rs, 0, 0, instruction & 0xFFFF)
 
         elif opcode == 2: # Example J-type
-            target = instruction & 0x3FFFFFF
-            self.pc = (self.pc & 0xF0000000) | (target << 2) # Very simple jump
+            return (OP_JUMP, 0, 0, 0, instruction & 0x3FFFFFF)
 
         elif opcode == 3:  # Example: Draw pixel
-            x = self.registers[1]
-            y = self.registers[2]
-            color = self.registers[3]
-            self.graphics.draw_pixel(x, y, color)
+            return (OP_DRAW_PIXEL, 0, 0, 0, 0)
 
         elif opcode == 4:
-            self.graphics.render()
-            time.sleep(0.05)
+            return (OP_RENDER, 0, 0, 0, 0)
 
         elif opcode == 63:  # Example: Halt
-            self.running = False
+            return (OP_HALT, 0, 0, 0, 0)
 
-        else:
-            raise ValueError(f"Unknown opcode: {opcode}")
+        return (OP_INVALID, opcode, 0, 0, 0)
+
+    def _op_add(self, rs, rt, rd, _imm):
+        # Example: Add two registers
+        self.registers[rd] = self.registers[rs] + self.registers[rt]
+
+    def _op_addi(self, rs, _rt, _rd, imm):
+        self.registers[rs] += imm
+
+    def _op_jump(self, _a, _b, _c, target):
+        self.pc = (self.pc & 0xF0000000) | (target << 2) # Very simple jump
+
+    def _op_draw_pixel(self, _a, _b, _c, _imm):
+        x = self.registers[1]
+        y = self.registers[2]
+        color = self.registers[3]
+        self.graphics.draw_pixel(x, y, color)
+
+    def _op_render(self, _a, _b, _c, _imm):
+        self.graphics.render()
+        # Hand control back to Tk until the next frame is due
+        self.next_frame_deadline = time.perf_counter() + self.FRAME_TIME
+        self.frame_done = True
+
+    def _op_halt(self, _a, _b, _c, _imm):
+        self.running = False
+
+    def _op_invalid(self, opcode, _b, _c, _imm):
+        raise ValueError(f"Unknown opcode: {opcode}")
 
     def run(self):
-      while self.running:
-        instruction = self.fetch_instruction()
-        self.execute_instruction(instruction)
+        # (Re)start the run loop as a chain of Tk callbacks
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(0, self.run_chunk)
+
+    def run_chunk(self):
+        self._after_id = None
+        if not self.running:
+            return
+
+        delay = self.next_frame_deadline - time.perf_counter()
+        if delay > 0:
+            self._after_id = self.root.after(math.ceil(delay * 1000), self.run_chunk)
+            return
+
+        self.frame_done = False
+        try:
+            self._run_instructions(self.CHUNK_SIZE)
+
+        except Exception as e:
+            messagebox.showerror("Emulation Error", str(e))
+            self.running = False
+
+        if self.running:
+            self._after_id = self.root.after(0, self.run_chunk)
+
+    def _run_instructions(self, count):
+        # Stop early at the end of a frame or on halt
+        icache = self.icache
+        handlers = self._handlers
+        try:
+            for _ in range(count):
+                op, a, b, c, imm = icache[self.pc >> 2]
+                self.pc += 4
+                handlers[op](a, b, c, imm)
+                if self.frame_done or not self.running:
+                    return
+
+        except IndexError:
+            if (self.pc >> 2) < len(icache):
+                raise
+            raise MemoryError(f"Instruction fetch outside the program at address: 0x{self.pc:08x}") from None
 
 class GameWindow(tk.Toplevel):
     def __init__(self, parent, rom_path):
@@ -150,7 +263,7 @@ class GameWindow(tk.Toplevel):
         self.load_rom()
 
         # Initialize kernel
-        self.kernel = Kernel(self.memory, self.graphics)
+        self.kernel = Kernel(self.memory, self.graphics, self)
         
         # Set up simple demo program
         demo_program = [
@@ -164,7 +277,7 @@ class GameWindow(tk.Toplevel):
             0x04 << 26,                     # render
             0x3F << 26,                      # halt
         ]
-        self.kernel.load_program(demo_program)
+        self.kernel.load_program(struct.pack(f'>{len(demo_program)}I', *demo_program))
         self.kernel.run()
 
         # Bind keys
@@ -194,7 +307,27 @@ class CheatManager:
     def __init__(self):
         self.cheats = []
 
+        # Parsed codes as parallel arrays, entry i belongs to self.cheats[i];
+        # capacity grows by doubling
+        self.addresses = np.zeros(16, dtype=np.uint32)
+        self.values = np.zeros(16, dtype=np.uint16)
+        self.halfword = np.zeros(16, dtype=np.bool_)
+        self.enabled = np.zeros(16, dtype=np.bool_)
+
     def add_cheat(self, code, description):
+        # Raises ValueError for malformed codes, before anything is stored
+        address, value, halfword = self.parse_gameshark_code(code)
+
+        index = len(self.cheats)
+        if index == len(self.enabled):
+            self.addresses = np.concatenate((self.addresses, np.zeros_like(self.addresses)))
+            self.values = np.concatenate((self.values, np.zeros_like(self.values)))
+            self.halfword = np.concatenate((self.halfword, np.zeros_like(self.halfword)))
+            self.enabled = np.concatenate((self.enabled, np.zeros_like(self.enabled)))
+
+        self.addresses[index] = address
+        self.values[index] = value
+        self.halfword[index] = halfword
         self.cheats.append({
             'code': code,
             'description': description,
@@ -204,21 +337,35 @@ class CheatManager:
     def toggle_cheat(self, index):
         if 0 <= index < len(self.cheats):
             self.cheats[index]['enabled'] = not self.cheats[index]['enabled']
+            self.enabled[index] = self.cheats[index]['enabled']
 
     def apply_cheats(self, memory):
-        for cheat in self.cheats:
-            if cheat['enabled']:
-                # Parse and apply GameShark code
-                self.apply_gameshark_code(cheat['code'], memory)
-
-    def apply_gameshark_code(self, code, memory):
-        # GameShark code interpretation logic
-        code = code.replace(" ", "")
-        if len(code) == 12:  # Standard GameShark code length
-            address = int(code[2:6], 16)
-            value = int(code[6:], 16)
-            # Modify memory at address
-            memory[address] = value
+        active = np.flatnonzero(self.enabled[:len(self.cheats)])
+        if not active.size:
+            return
+
+        addresses = self.addresses[active]
+        values = self.values[active]
+        halfword = self.halfword[active]
+
+        # Scatter every active code into RAM at once; 16-bit codes are
+        # big-endian, high byte at the address and low byte after it
+        memory.write_bytes(
+            np.concatenate((addresses, addresses[halfword] + 1)),
+            np.concatenate((np.where(halfword, values >> 8, values),
+                            values[halfword] & 0xFF)).astype(np.uint8))
+
+    def parse_gameshark_code(self, code):
+        # GameShark code interpretation logic, returns (address, value, halfword)
+        stripped = code.replace(" ", "")
+        if len(stripped) != 12:  # Standard GameShark code length
+            raise ValueError(f"Invalid GameShark code: {code}")
+        halfword = stripped[:2] == "81"  # 81 codes write 16 bits, others 8
+        address = int(stripped[2:6], 16)
+        value = int(stripped[6:], 16)
+        if value > (0xFFFF if halfword else 0xFF):
+            raise ValueError(f"GameShark code value is too wide for its type: {code}")
+        return address, value, halfword
 
 class WiiVirtualConsole:
     def __init__(self, root):
@@ -385,7 +532,12 @@ class WiiVirtualConsole:
             code = code_entry.get()
             desc = desc_entry.get()
             if code and desc:
-                self.cheat_manager.add_cheat(code, desc)
+                try:
+                    self.cheat_manager.add_cheat(code, desc)
+                except ValueError:
+                    messagebox.showerror("Error", f"Invalid GameShark code: {code}",
+                                         parent=dialog)
+                    return
                 self.update_cheat_list()
                 dialog.destroy()
 